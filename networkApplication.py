@@ -19,33 +19,45 @@ def setupArgumentParser() -> argparse.Namespace:
         subparsers = parser.add_subparsers(help='sub-command help')
         
         parser_p = subparsers.add_parser('ping', aliases=['p'], help='run ping')
-        parser_p.set_defaults(timeout=4)
+        parser_p.set_defaults(timeout=4, family=socket.AF_UNSPEC)
         parser_p.add_argument('hostname', type=str, help='host to ping towards')
         parser_p.add_argument('--count', '-c', nargs='?', type=int,
                               help='number of times to ping the host before stopping')
         parser_p.add_argument('--timeout', '-t', nargs='?',
                               type=int,
                               help='maximum timeout before considering request lost')
+        parser_p.add_argument('-4', dest='family', action='store_const', const=socket.AF_INET,
+                              help='only ping the IPv4 address of the host')
+        parser_p.add_argument('-6', dest='family', action='store_const', const=socket.AF_INET6,
+                              help='only ping the IPv6 address of the host')
         parser_p.set_defaults(func=ICMPPing)
 
         parser_t = subparsers.add_parser('traceroute', aliases=['t'],
                                          help='run traceroute')
-        parser_t.set_defaults(timeout=4, protocol='icmp')
+        parser_t.set_defaults(timeout=4, protocol='icmp', family=socket.AF_UNSPEC)
         parser_t.add_argument('hostname', type=str, help='host to traceroute towards')
         parser_t.add_argument('--timeout', '-t', nargs='?', type=int,
                               help='maximum timeout before considering request lost')
         parser_t.add_argument('--protocol', '-p', nargs='?', type=str,
                               help='protocol to send request with (UDP/ICMP)')
+        parser_t.add_argument('-4', dest='family', action='store_const', const=socket.AF_INET,
+                              help='only trace the route to the IPv4 address of the host')
+        parser_t.add_argument('-6', dest='family', action='store_const', const=socket.AF_INET6,
+                              help='only trace the route to the IPv6 address of the host')
         parser_t.set_defaults(func=Traceroute)
         
         parser_pt = subparsers.add_parser('paris-traceroute', aliases=['pt'],
                                          help='run paris-traceroute')
-        parser_pt.set_defaults(timeout=4, protocol='icmp')
+        parser_pt.set_defaults(timeout=4, protocol='icmp', family=socket.AF_UNSPEC)
         parser_pt.add_argument('hostname', type=str, help='host to traceroute towards')
         parser_pt.add_argument('--timeout', '-t', nargs='?', type=int,
                               help='maximum timeout before considering request lost')
         parser_pt.add_argument('--protocol', '-p', nargs='?', type=str,
                               help='protocol to send request with (UDP/ICMP)')
+        parser_pt.add_argument('-4', dest='family', action='store_const', const=socket.AF_INET,
+                               help='only trace the route to the IPv4 address of the host')
+        parser_pt.add_argument('-6', dest='family', action='store_const', const=socket.AF_INET6,
+                               help='only trace the route to the IPv6 address of the host')
         parser_pt.set_defaults(func=ParisTraceroute)
 
         parser_w = subparsers.add_parser('web', aliases=['w'], help='run web server')
@@ -64,8 +76,29 @@ def setupArgumentParser() -> argparse.Namespace:
         return args
 
 
+# Per-family ICMP numbers, so the probe engine below never branches on message layout
+ICMP_TYPES = {
+    socket.AF_INET: {'protocol': socket.IPPROTO_ICMP, 'echoRequest': 8, 'echoReply': 0,
+                     'timeExceeded': 11, 'unreachable': 3},
+    socket.AF_INET6: {'protocol': socket.IPPROTO_ICMPV6, 'echoRequest': 128, 'echoReply': 129,
+                      'timeExceeded': 3, 'unreachable': 1},
+}
+FAMILY_NAMES = {socket.AF_INET: 'IPv4', socket.AF_INET6: 'IPv6'}
+IPV6_HEADER_LENGTH = 40  # IPv6 headers are fixed length (extension headers are not followed)
+UDP_PORT = 33434  # Base destination port used by traceroute for UDP probes
+MAX_HOPS = 30  # Give up tracing after this many hops
+HOPS_PER_BATCH = 8  # Number of consecutive hops probed together in one batch
+
+
+class ProbeSocketError(OSError):
+    """Raised by NetworkApplication.openProbeSockets when the probe sockets cannot be created."""
+
+
 class NetworkApplication:
 
+    # Paris-traceroute keeps every probe in the same flow so load balancers route them identically
+    parisFlow = False
+
     def checksum(self, dataToChecksum: str) -> str:
         csum = 0
         countTo = (len(dataToChecksum) // 2) * 2
@@ -91,6 +124,284 @@ class NetworkApplication:
 
         return answer
 
+    # Function to resolve a hostname to one address per supported family
+    def resolveTargets(self, hostname, family=socket.AF_UNSPEC):
+        """
+        Resolve the hostname through getaddrinfo, keeping the first address of each family.
+        Arguments:
+            hostname -- the target hostname (or IP address)
+            family -- AF_INET or AF_INET6 to restrict resolution, AF_UNSPEC for both
+        Returns:
+            A list of (family, address) tuples in resolver order, empty if the hostname could not be resolved.
+        """
+        try:
+            addresses = socket.getaddrinfo(hostname, None, family, socket.SOCK_RAW)
+        except socket.gaierror as e:
+            # Also raised when the host has no address of the requested family (-4 or -6)
+            print("Could not resolve %s: %s" % (hostname, e.strerror))
+            return []
+
+        targets = []
+        for addressFamily, _, _, _, socketAddress in addresses:
+            if addressFamily in ICMP_TYPES and addressFamily not in [f for f, _ in targets]:
+                targets.append((addressFamily, socketAddress[0]))
+        if not targets:
+            print("No IPv4 or IPv6 address found for %s" % (hostname))
+        return targets
+
+    # Function to open the sockets used to send probes and receive their ICMP responses
+    def openProbeSockets(self, family, protocol):
+        """
+        Open the sockets for one probing run.
+        Arguments:
+            family -- AF_INET or AF_INET6
+            protocol -- "ICMP" or "UDP", specifies the type of probe to send
+        Returns:
+            A tuple (sendSocket, icmpSocket, ID), where ID identifies this run's probes in
+            responses (the ICMP identifier, or the UDP source port).
+        Raises:
+            ProbeSocketError if a socket cannot be created, so callers can tell it apart from send errors.
+        """
+        try:
+            icmpSocket = socket.socket(family, socket.SOCK_RAW, ICMP_TYPES[family]['protocol'])
+        except socket.error as e:
+            raise ProbeSocketError(e.errno, e.strerror) from e
+        if protocol == "ICMP":
+            # Echo requests are sent and answered on the same raw socket
+            return icmpSocket, icmpSocket, os.getpid() & 0xFFFF
+
+        try:
+            # UDP probes leave from a fixed source port so errors quoting them can be matched
+            sendSocket = socket.socket(family, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sendSocket.bind(('', 0))
+        except socket.error as e:
+            icmpSocket.close()
+            raise ProbeSocketError(e.errno, e.strerror) from e
+        return sendSocket, icmpSocket, sendSocket.getsockname()[1]
+
+    # Function to close the sockets opened by openProbeSockets
+    def closeProbeSockets(self, sendSocket, icmpSocket):
+        if sendSocket is not icmpSocket:
+            sendSocket.close()
+        icmpSocket.close()
+
+    # Function to set the TTL (IPv4) or hop limit (IPv6) of outgoing probes
+    def setHopLimit(self, probeSocket, family, ttl):
+        if family == socket.AF_INET6:
+            probeSocket.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_UNICAST_HOPS, ttl)
+        else:
+            probeSocket.setsockopt(socket.SOL_IP, socket.IP_TTL, ttl)
+
+    # Function to build a single probe packet
+    def buildProbe(self, family, ID, sequence, protocol):
+        """
+        Build an ICMP Echo Request or UDP probe carrying the given sequence number.
+        Arguments:
+            family -- AF_INET or AF_INET6
+            ID -- the identifier used to match requests and responses
+            sequence -- the number identifying this probe within the run
+            protocol -- "ICMP" or "UDP", specifies the type of probe to send
+        Returns:
+            A tuple (packet, port), where port is the destination port to send the packet to.
+        """
+        if protocol == "UDP":
+            # The payload length identifies the probe, since ICMP errors quote the UDP header.
+            # Classic traceroute also varies the destination port, Paris keeps the flow fixed.
+            port = UDP_PORT if self.parisFlow else UDP_PORT + sequence
+            return bytes(sequence), port
+
+        echoRequest = ICMP_TYPES[family]['echoRequest']
+        # Paris pads with the complement of the sequence number so the checksum,
+        # which load balancers hash in place of ports, is identical for every probe
+        data = struct.pack("H", ~sequence & 0xFFFF if self.parisFlow else 0)
+        header = struct.pack("BBHHH", echoRequest, 0, 0, ID, sequence)
+        if family == socket.AF_INET:
+            # The kernel fills in ICMPv6 checksums, since they cover the IPv6 pseudo-header
+            header = struct.pack("BBHHH", echoRequest, 0, self.checksum(header + data), ID, sequence)
+        return header + data, 0
+
+    # Function to find which probe a received ICMP packet answers
+    def parseResponse(self, family, packet, protocol):
+        """
+        Parse an Echo Reply, Time Exceeded or Destination Unreachable message.
+        Arguments:
+            family -- AF_INET or AF_INET6
+            packet -- the bytes read from the raw ICMP socket
+            protocol -- "ICMP" or "UDP", the type of probe that was sent
+        Returns:
+            A tuple (ID, sequence, packetLength, icmpType, code) identifying the probe, where packetLength is
+            the size of the ICMP message without any IP header, or None if the packet is not a response to a probe.
+        """
+        types = ICMP_TYPES[family]
+        if family == socket.AF_INET:
+            # IPv4 raw sockets deliver the IP header too
+            packet = self.stripIpv4Header(packet)
+        if len(packet) < 8:
+            return None
+
+        icmpType, code = packet[0], packet[1]
+        details = (len(packet), icmpType, code)
+        if icmpType == types['echoReply'] and protocol == "ICMP":
+            return struct.unpack("HH", packet[4:8]) + details
+        if icmpType not in (types['timeExceeded'], types['unreachable']):
+            return None
+
+        # Errors quote the IP header and first 8 bytes of the probe after their own 8-byte header
+        quoted = packet[8:]
+        if family == socket.AF_INET6:
+            quoted = quoted[IPV6_HEADER_LENGTH:]
+        else:
+            quoted = self.stripIpv4Header(quoted)
+        if len(quoted) < 8:
+            return None
+
+        if protocol == "ICMP":
+            if quoted[0] != types['echoRequest']:
+                return None
+            return struct.unpack("HH", quoted[4:8]) + details
+        sourcePort, destinationPort, length, checksum = struct.unpack("!HHHH", quoted[:8])
+        return (sourcePort, length - 8) + details
+
+    # Function to skip the IPv4 header at the start of a packet
+    def stripIpv4Header(self, packet):
+        """
+        Return the payload following the IPv4 header, whose length is given in 32-bit words,
+        or an empty payload if the packet is too short to hold that header.
+        """
+        if len(packet) < 20:
+            return b''
+        headerLength = (packet[0] & 0x0F) * 4
+        if headerLength < 20 or len(packet) < headerLength:
+            return b''
+        return packet[headerLength:]
+
+    # Function to send a batch of probes
+    def sendProbes(self, sendSocket, family, address, ID, probes, protocol):
+        """
+        Send every probe of a batch without waiting for responses in between.
+        Arguments:
+            sendSocket -- the socket used to send the probes
+            family -- AF_INET or AF_INET6
+            address -- the target IP address
+            ID -- the identifier used to match requests and responses
+            probes -- a list of (ttl, sequence) tuples, a ttl of None keeps the system default
+            protocol -- "ICMP" or "UDP", specifies the type of probe to send
+        Returns:
+            A dictionary mapping each sequence number to the time its probe was sent.
+        """
+        timesOfSending = {}
+        for ttl, sequence in probes:
+            if ttl is not None:
+                self.setHopLimit(sendSocket, family, ttl)
+            packet, port = self.buildProbe(family, ID, sequence, protocol)
+            sendSocket.sendto(packet, (address, port))
+            timesOfSending[sequence] = time.time()
+        return timesOfSending
+
+    # Function to receive the responses to a batch of probes
+    def receiveProbes(self, icmpSocket, family, ID, timesOfSending, timeout, protocol):
+        """
+        Collect responses until every probe is answered or the timeout expires.
+        Arguments:
+            icmpSocket -- the raw socket the ICMP responses arrive on
+            family -- AF_INET or AF_INET6
+            ID -- the identifier used to match requests and responses
+            timesOfSending -- the dictionary returned by sendProbes
+            timeout -- time (in seconds) to wait for the whole batch
+            protocol -- "ICMP" or "UDP", the type of probe that was sent
+        Returns:
+            A dictionary mapping each answered sequence number to a tuple (delay, address, packetLength,
+            icmpType, code), where delay is the round-trip time in milliseconds, address is the responder's
+            address and packetLength is the size of the ICMP response, so both families report the same size.
+        """
+        responses = {}
+        deadline = time.time() + timeout
+        while len(responses) < len(timesOfSending):
+            timeRemaining = deadline - time.time()
+            if timeRemaining <= 0:
+                break
+            ready = select.select([icmpSocket], [], [], timeRemaining)
+            if ready[0] == []:  # Timeout occurred (no packet received)
+                break
+
+            timeOfReceipt = time.time()
+            receivedPacket, address = icmpSocket.recvfrom(1024)
+            match = self.parseResponse(family, receivedPacket, protocol)
+            if match is None:
+                continue
+            packetID, sequence, packetLength, icmpType, code = match
+            # Raw sockets see every ICMP message on the host, so ignore other processes' probes
+            if packetID != ID or sequence not in timesOfSending or sequence in responses:
+                continue
+            delay = (timeOfReceipt - timesOfSending[sequence]) * 1000
+            responses[sequence] = (delay, address[0], packetLength, icmpType, code)
+        return responses
+
+    # Function to send a batch of probes and wait for their responses
+    def doProbes(self, sendSocket, icmpSocket, family, address, ID, probes, timeout, protocol):
+        timesOfSending = self.sendProbes(sendSocket, family, address, ID, probes, protocol)
+        return self.receiveProbes(icmpSocket, family, ID, timesOfSending, timeout, protocol)
+
+    # Function to trace the route to one address
+    def traceRoute(self, family, address, timeout, protocol, queries):
+        """
+        Trace the route to an address, probing HOPS_PER_BATCH consecutive hops per batch.
+        Arguments:
+            family -- AF_INET or AF_INET6
+            address -- the target IP address
+            timeout -- time (in seconds) to wait for each batch
+            protocol -- "ICMP" or "UDP", specifies the type of probe to send
+            queries -- number of probes sent to each hop
+        Returns:
+            A list of (ttl, replies) tuples up to the destination or the first unreachable hop, where replies
+            holds one (delay, address, packetLength, icmpType, code) tuple per query, or None if that query timed out.
+        """
+        unreachable = ICMP_TYPES[family]['unreachable']
+        sendSocket, icmpSocket, ID = self.openProbeSockets(family, protocol)
+        hops = []
+        try:
+            for firstTtl in range(1, MAX_HOPS + 1, HOPS_PER_BATCH):
+                ttls = range(firstTtl, min(firstTtl + HOPS_PER_BATCH, MAX_HOPS + 1))
+                probes = [(ttl, (ttl - 1) * queries + query + 1) for ttl in ttls for query in range(queries)]
+                responses = self.doProbes(sendSocket, icmpSocket, family, address, ID, probes, timeout, protocol)
+                for ttl in ttls:
+                    replies = [responses.get((ttl - 1) * queries + query + 1) for query in range(queries)]
+                    hops.append((ttl, replies))
+                    # Like classic traceroute, a Destination Unreachable (!H, !N, ...) also ends the trace
+                    if any(reply is not None and (reply[1] == address or reply[3] == unreachable)
+                           for reply in replies):
+                        return hops
+        finally:
+            self.closeProbeSockets(sendSocket, icmpSocket)
+        return hops
+
+    # Function to probe every resolved address of a host at the same time
+    def probeFamilies(self, targets, probe):
+        """
+        Run probe(family, address) for every target in its own thread, so dual-stack hosts
+        are measured over IPv4 and IPv6 concurrently.
+        Arguments:
+            targets -- the list returned by resolveTargets
+            probe -- the function to run for each target
+        Returns:
+            The results of probe in target order, an exception raised by probe is returned in its place.
+        """
+        results = [None] * len(targets)
+
+        def run(index, family, address):
+            try:
+                results[index] = probe(family, address)
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=run, args=(index, family, address))
+                   for index, (family, address) in enumerate(targets)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
     def printOneResult(self, destinationAddress: str, packetLength: int, time: float, ttl: int, destinationHostname=''):
         if destinationHostname:
             print("%d bytes from %s (%s): ttl=%d time=%.2f ms" % (packetLength, destinationHostname, destinationAddress, ttl, time))
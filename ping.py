@@ -1,135 +1,56 @@
 import socket
-import struct
+import threading
 import time
-import os
-import select
 
-# ICMP packet constants
-ICMP_ECHO_REQUEST = 8  # Echo request (type 8 for ping)
-ICMP_ECHO_REPLY = 0    # Echo reply (type 0 for ping reply)
-ICMP_CODE = socket.getprotobyname('icmp')  # Protocol number for ICMP
+from networkApplication import NetworkApplication, FAMILY_NAMES
 
-# Checksum function for calculating the checksum of an ICMP packet
-def checksum(source_string):
-    """
-    Compute the checksum for the given data (source_string).
-    This is used to verify data integrity for ICMP packets.
-    """
-    count_to = (len(source_string) // 2) * 2  # Process data in 2-byte chunks
-    summation = 0  # Initialize sum
-    count = 0  # Counter to iterate through the data
-
-    # Sum all the 16-bit chunks
-    while count < count_to:
-        this_val = source_string[count + 1] * 256 + source_string[count]
-        summation = summation + this_val
-        summation = summation & 0xffffffff  # Keep summation within 32 bits
-        count = count + 2
-
-    # If there's an odd byte at the end, add it separately
-    if count_to < len(source_string):
-        summation = summation + source_string[len(source_string) - 1]
-        summation = summation & 0xffffffff
-
-    # Add high 16 bits to low 16 bits
-    summation = (summation >> 16) + (summation & 0xffff)
-    summation = summation + (summation >> 16)
-    
-    # One's complement and mask to 16 bits
-    answer = ~summation
-    answer = answer & 0xffff
-    answer = answer >> 8 | (answer << 8 & 0xff00)
-    return answer
-
-
-class ICMPPing:
+class ICMPPing(NetworkApplication):
     
-    # Function to receive a ping response
-    def receiveOnePing(self, icmpSocket, destinationAddress, ID, timeout):
+    # Function to perform one ping
+    def doOnePing(self, sendSocket, icmpSocket, family, destinationAddress, ID, sequence, timeout):
         """
-        Receive the ICMP reply (ping response).
+        Perform one ping to the destination through the shared probe engine.
         Arguments:
-            icmpSocket -- the socket used to send/receive ICMP packets
+            sendSocket, icmpSocket -- the sockets returned by openProbeSockets
+            family -- AF_INET or AF_INET6
             destinationAddress -- the target IP address
             ID -- the identifier used to match requests and responses
+            sequence -- the sequence number of this ping
             timeout -- time to wait for a response (in seconds)
         Returns:
-            The time delay (in seconds) if the packet is received successfully, else None on timeout.
+            A tuple (delay, address, packetLength, icmpType, code) for the reply, or None if it timed out.
         """
-        time_remaining = timeout  # Time left to wait for a response
-        while True:
-            start_time = time.time()  # Record the time at the start of waiting
-            # Check if socket is ready to receive within the remaining time
-            ready = select.select([icmpSocket], [], [], time_remaining)
-            time_spent = time.time() - start_time  # Calculate time spent waiting
-
-            if ready[0] == []:  # Timeout occurred (no packet received)
-                return None
+        # Send the ICMP Echo Request with the default TTL and wait for the Echo Reply
+        responses = self.doProbes(sendSocket, icmpSocket, family, destinationAddress, ID,
+                                  [(None, sequence)], timeout, "ICMP")
+        return responses.get(sequence)
 
-            time_received = time.time()  # Record the time when the packet was received
-            rec_packet, addr = icmpSocket.recvfrom(1024)  # Receive packet
-
-            # Extract ICMP header from the received packet (skip IP header, first 20 bytes)
-            icmp_header = rec_packet[20:28]
-            type, code, checksum, packet_ID, sequence = struct.unpack("bbHHh", icmp_header)
-
-            # Check if the received packet has the correct ID (to match the sent request)
-            if packet_ID == ID:
-                # Unpack the timestamp sent with the packet
-                time_sent = struct.unpack("d", rec_packet[28:28 + struct.calcsize("d")])[0]
-                # Return the delay between sending and receiving the packet
-                return time_received - time_sent
-
-            # Adjust the remaining time to wait after each iteration
-            time_remaining = time_remaining - time_spent
-            if time_remaining <= 0:
-                return None
-
-    # Function to send an ICMP Echo Request
-    def sendOnePing(self, icmpSocket, destinationAddress, ID):
+    # Function to send all pings to one address
+    def pingAddress(self, family, destinationAddress, timeout, count):
         """
-        Send one ICMP Echo Request (ping).
+        Ping one address of the host, printing each result as it arrives.
         Arguments:
-            icmpSocket -- the socket used to send the ICMP request
+            family -- AF_INET or AF_INET6
             destinationAddress -- the target IP address
-            ID -- the identifier used to match requests and responses
-        """
-        # Create an ICMP header with type=8 (Echo Request), code=0, and a dummy checksum
-        header = struct.pack("bbHHh", ICMP_ECHO_REQUEST, 0, 0, ID, 1)
-        # Add current timestamp to the data payload (used to calculate round-trip time)
-        data = struct.pack("d", time.time())
-
-        # Calculate the checksum for the packet (header + data)
-        packet_checksum = checksum(header + data)
-
-        # Rebuild the ICMP header with the correct checksum
-        header = struct.pack("bbHHh", ICMP_ECHO_REQUEST, 0, packet_checksum, ID, 1)
-        packet = header + data  # Complete the packet (header + data)
-
-        # Send the packet to the destination address
-        icmpSocket.sendto(packet, (destinationAddress, 1))
-
-    # Function to perform one ping
-    def doOnePing(self, destinationAddress, timeout):
-        """
-        Perform one ping to the destination.
-        Arguments:
-            destinationAddress -- the target IP address
-            timeout -- time to wait for a response (in seconds)
-        Returns:
-            The time delay for the ping or None if it timed out.
+            timeout -- maximum time to wait for each ping response (in seconds)
+            count -- number of pings to send
         """
-        # Create a raw socket to send and receive ICMP packets
-        icmpSocket = socket.socket(socket.AF_INET, socket.SOCK_RAW, ICMP_CODE)
-        ID = os.getpid() & 0xFFFF  # Use the process ID as the packet ID
-
-        # Send the ICMP Echo Request
-        self.sendOnePing(icmpSocket, destinationAddress, ID)
-        # Receive the ICMP Echo Reply and calculate the delay
-        delay = self.receiveOnePing(icmpSocket, destinationAddress, ID, timeout)
-
-        icmpSocket.close()  # Close the socket after use
-        return delay
+        sendSocket, icmpSocket, ID = self.openProbeSockets(family, "ICMP")
+        try:
+            for sequence in range(1, count + 1):
+                reply = self.doOnePing(sendSocket, icmpSocket, family, destinationAddress, ID, sequence, timeout)
+                # Both families print from their own thread, so keep their lines whole
+                with self.printLock:
+                    if reply is None:
+                        # If the ping timed out, print timeout message
+                        self.printOneResult(destinationAddress, 0, None, 64)
+                    else:
+                        # If successful, print the result (assuming TTL=64)
+                        delay, address, packet_size, icmp_type, code = reply
+                        self.printOneResult(address, 64, delay, packet_size)
+                time.sleep(1)  # Wait for 1 second before sending the next ping
+        finally:
+            self.closeProbeSockets(sendSocket, icmpSocket)
 
     # Function to display the result of a ping
     def printOneResult(self, destinationAddress, ttl, delay, packet_size):
@@ -138,39 +59,39 @@ class ICMPPing:
         Arguments:
             destinationAddress -- the target IP address
             ttl -- time-to-live (hop limit)
-            delay -- the round-trip time (in seconds)
-            packet_size -- the size of the ICMP packet sent
+            delay -- the round-trip time (in milliseconds)
+            packet_size -- the size of the ICMP reply received, without the IP header
         """
         if delay is None:
             print(f"Request timed out.")  # If no response was received
         else:
-            delay = delay * 1000  # Convert delay to milliseconds
             print(f"{packet_size} bytes from {destinationAddress}: ttl={ttl} time={delay:.2f} ms")
 
     # Constructor that initializes the ping process
-    def __init__(self, hostname, timeout=1, count=4):
+    def __init__(self, hostname, timeout=1, count=4, family=socket.AF_UNSPEC):
         """
         Initialize the ICMPPing instance and start sending pings.
         Arguments:
             hostname -- the target hostname (or IP address)
             timeout -- maximum time to wait for each ping response (in seconds)
             count -- number of pings to send
+            family -- AF_INET or AF_INET6 to ping only that family, AF_UNSPEC to ping every address
         """
-        # Resolve the hostname to its IP address
-        destinationAddress = socket.gethostbyname(hostname)
-        print(f"Ping to {hostname} [{destinationAddress}] with {count} packets:")
-
-        # Loop to send the specified number of pings
-        for i in range(count):
-            # Send one ping and measure the delay
-            delay = self.doOnePing(destinationAddress, timeout)
-            if delay is None:
-                # If the ping timed out, print timeout message
-                self.printOneResult(destinationAddress, 0, None, 64)
-            else:
-                # If successful, print the result (assuming TTL=64 and packet size=64 bytes)
-                self.printOneResult(destinationAddress, 64, delay, 64)
-            time.sleep(1)  # Wait for 1 second before sending the next ping
+        # Resolve the hostname to its IPv4 and/or IPv6 address
+        targets = self.resolveTargets(hostname, family)
+        if not targets:
+            return  # The hostname has no usable address
+        for targetFamily, destinationAddress in targets:
+            print(f"Ping to {hostname} [{destinationAddress}] over {FAMILY_NAMES[targetFamily]} with {count} packets:")
+
+        # Ping every address concurrently so dual-stack hosts can be compared
+        self.printLock = threading.Lock()
+        results = self.probeFamilies(
+            targets, lambda targetFamily, destinationAddress: self.pingAddress(targetFamily, destinationAddress,
+                                                                                timeout, count))
+        for (targetFamily, destinationAddress), error in zip(targets, results):
+            if error is not None:
+                print(f"Ping to {destinationAddress} failed: {error}")
 
 
 if __name__ == "__main__":